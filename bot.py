@@ -1,11 +1,14 @@
 import os
+import re
+import io
+import csv
 import asyncio
 import logging
-from datetime import date, time
+from datetime import date, datetime, time, timedelta, timezone
 from zoneinfo import ZoneInfo
 
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -13,11 +16,24 @@ from telegram.ext import (
     JobQueue,
     CallbackQueryHandler,
     MessageHandler,
+    TypeHandler,
+    ApplicationHandlerStop,
     filters,
 )
 
-from supabase_client import SupabaseClient
+from schema import FEEDS_DATE_COLUMN
+from supabase_client import SupabaseClient, AsyncSupabaseClient
 from messages import get_message, detect_user_language
+from family import CaregiverFanout, DailyAggregates, feed_scope, new_invite_code
+from idempotency import RecentKeys, feed_idempotency_key
+from update_processor import PerUserUpdateProcessor
+from rate_limit import RateLimiter, GLOBAL_LIMITED
+from outbound import OutboundDispatcher, INTERACTIVE, BULK
+from prediction import FeedIntervalEstimator, TimerWheel
+from loop_monitor import LoopLagMonitor
+from health import HealthServer
+from histogram import FeedSizeHistogram
+from retention import FeedArchive, compact_old_feeds
 
 # Configure logging
 logging.basicConfig(
@@ -38,6 +54,8 @@ logger.info("Bot starting...")
 
 # Supabase integration
 supabase = SupabaseClient()
+# Handlers go through this, so Supabase requests run off the event loop
+db = AsyncSupabaseClient(supabase)
 
 # Keep a set of users who have used the bot
 USERS: set[int] = set()
@@ -48,11 +66,78 @@ USER_STATES: dict[int, str] = {}
 # Default timezone (used if user hasn't set a custom one)
 DEFAULT_TZ = ZoneInfo("Europe/Madrid")
 
+# Shared baby profiles: which baby each user logs for, and who cares for each baby
+USER_BABIES: dict[int, int | None] = {}
+BABY_PROFILES: dict[int, dict] = {}
+BABY_CAREGIVERS: dict[int, list[int]] = {}
+
+# Batched notifications to the other caregivers of a baby
+CAREGIVER_FANOUT = CaregiverFanout()
+FANOUT_INTERVAL_SECONDS = int(os.getenv("FANOUT_INTERVAL_SECONDS", "30"))
+
+# Daily totals, computed once per baby (or individual user) and shared
+DAILY_TOTALS = DailyAggregates()
+
+# Idempotency keys of recently logged feeds, to drop redelivered updates early
+RECENT_FEED_KEYS = RecentKeys()
+
+# Different users' updates run concurrently, each user's own updates in order
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "16"))
+METRICS_INTERVAL_SECONDS = int(os.getenv("METRICS_INTERVAL_SECONDS", "300"))
+# Past this many pending updates, new ones are shed before they are queued
+SHED_QUEUE_DEPTH = int(os.getenv("SHED_QUEUE_DEPTH", str(MAX_CONCURRENT_UPDATES * 4)))
+UPDATE_PROCESSOR = PerUserUpdateProcessor(
+    MAX_CONCURRENT_UPDATES,
+    shed_queue_depth=SHED_QUEUE_DEPTH,
+    on_shed=lambda update: reject_update(update, "bot_busy"),
+)
+
+# Rate limiting to protect the Supabase request quota
+RATE_LIMITER = RateLimiter(
+    user_rate=float(os.getenv("USER_RATE_PER_MINUTE", "20")) / 60,
+    user_burst=float(os.getenv("USER_RATE_BURST", "5")),
+    global_rate=float(os.getenv("GLOBAL_RATE_PER_SECOND", "20")),
+    global_burst=float(os.getenv("GLOBAL_RATE_BURST", "40")),
+)
+
+# All outgoing messages go through one rate-limited, prioritized queue
+OUTBOUND = OutboundDispatcher(
+    global_rate=float(os.getenv("OUTBOUND_GLOBAL_RATE", "25")),
+    workers=int(os.getenv("OUTBOUND_WORKERS", "4")),
+)
+
+# Next-feed estimates per baby (or individual user), and the shared nudge timers
+FEED_INTERVALS: dict[str, FeedIntervalEstimator] = {}
+NUDGE_WHEEL = TimerWheel(tick_seconds=60)
+NUDGE_LEAD_MINUTES = int(os.getenv("NUDGE_LEAD_MINUTES", "15"))
+NUDGE_MIN_SAMPLES = 3
+# Intervals this irregular (stddev / mean) make the estimate too unreliable to nudge
+NUDGE_MAX_VARIATION = float(os.getenv("NUDGE_MAX_VARIATION", "0.5"))
+USER_NUDGES: dict[int, bool] = {}
+
+# Per-user histogram of logged amounts, for the one-tap /feed keyboard
+FEED_HISTOGRAMS: dict[int, FeedSizeHistogram] = {}
+QUICK_FEED_BUTTONS = 4
+
+# Feeds older than this are moved from the hot table to rollups and archive files
+# Opt-in: raw feeds are deleted once archived, so ARCHIVE_DIR must be durable storage
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "90"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR")
+FEED_ARCHIVE = FeedArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None
+
+# Event loop lag watchdog, reported through the health endpoint (if a port is set)
+LOOP_MONITOR = LoopLagMonitor(threshold=float(os.getenv("LOOP_LAG_THRESHOLD_MS", "250")) / 1000)
+HEALTH_PORT = os.getenv("HEALTH_PORT") or os.getenv("PORT")
+HEALTH_SERVER = None
+
+# Cached user languages, used to answer rejected updates without database calls
+USER_LANGUAGES: dict[int, str] = {}
+
 
 # ---------------------- Helper Functions ----------------------
-def get_user_timezone(user_id: int):
+async def get_user_timezone(user_id: int):
     """Get the user's timezone or return default"""
-    user_tz = supabase.get_user_timezone(user_id)
+    user_tz = await db.get_user_timezone(user_id)
     if user_tz:
         try:
             return ZoneInfo(user_tz)
@@ -62,12 +147,16 @@ def get_user_timezone(user_id: int):
     return DEFAULT_TZ
 
 
-def get_user_language(update: Update) -> str:
+async def get_user_language(update: Update) -> str:
     """Get the user's preferred language"""
+    if update.effective_user.id in USER_LANGUAGES:
+        return USER_LANGUAGES[update.effective_user.id]
+    
     try:
         # First try to get from database
-        stored_lang = supabase.get_user_language(update.effective_user.id)
+        stored_lang = await db.get_user_language(update.effective_user.id)
         if stored_lang:
+            USER_LANGUAGES[update.effective_user.id] = stored_lang
             return stored_lang
         
         # Then try to detect from Telegram
@@ -75,12 +164,13 @@ def get_user_language(update: Update) -> str:
         
         # Store detected language for future use
         try:
-            supabase.set_user_language(update.effective_user.id, detected_lang)
+            await db.set_user_language(update.effective_user.id, detected_lang)
             logger.info(f"Stored language {detected_lang} for user {update.effective_user.id}")
         except Exception as e:
             # If storing fails, just continue
             logger.warning(f"Failed to store language for user {update.effective_user.id}: {e}")
         
+        USER_LANGUAGES[update.effective_user.id] = detected_lang
         return detected_lang
     except Exception as e:
         # If anything fails, fall back to English
@@ -88,49 +178,280 @@ def get_user_language(update: Update) -> str:
         return "en"
 
 
+async def reply(update: Update, text: str, **kwargs):
+    """
+    Queue a reply in the update's chat on the interactive outbound lane.
+
+    Doesn't wait for delivery: a flood-control pause must not keep the handler
+    holding its user lock and processor slot. Failures are logged by the
+    dispatcher.
+    """
+    return OUTBOUND.submit("send_message", INTERACTIVE,
+                           chat_id=update.effective_chat.id, text=text, **kwargs)
+
+
+async def lookup_user_language(user_id: int) -> str:
+    """Get a user's stored language when there's no update to detect it from"""
+    if user_id not in USER_LANGUAGES:
+        stored_lang = await db.get_user_language(user_id)
+        if not stored_lang:
+            return "en"
+        USER_LANGUAGES[user_id] = stored_lang
+    return USER_LANGUAGES[user_id]
+
+
+async def get_user_baby(user_id: int):
+    """Get the baby profile id a user logs for, or None if logging individually"""
+    if user_id not in USER_BABIES:
+        USER_BABIES[user_id] = await db.get_user_baby_id(user_id)
+    return USER_BABIES[user_id]
+
+
+async def get_baby_profile(baby_id: int):
+    """Get a baby profile row, cached after the first lookup"""
+    if baby_id not in BABY_PROFILES:
+        baby = await db.get_baby(baby_id)
+        if baby is None:
+            return None
+        BABY_PROFILES[baby_id] = baby
+    return BABY_PROFILES[baby_id]
+
+
+async def get_baby_caregivers(baby_id: int) -> list[int]:
+    """Get the caregivers of a baby profile, cached after the first lookup"""
+    if baby_id not in BABY_CAREGIVERS:
+        BABY_CAREGIVERS[baby_id] = await db.get_baby_caregivers(baby_id)
+    return BABY_CAREGIVERS[baby_id]
+
+
+async def get_user_nudges(user_id: int) -> bool:
+    """Whether a user wants "feed due" nudges, cached after the first lookup"""
+    if user_id not in USER_NUDGES:
+        USER_NUDGES[user_id] = await db.get_user_nudges(user_id)
+    return USER_NUDGES[user_id]
+
+
+def record_feed_time(user_id: int, baby_id: int | None, fed_at: datetime):
+    """Update the next-feed estimate in O(1) and (re)arm the "feed due" nudge"""
+    scope = feed_scope(user_id, baby_id)
+    estimator = FEED_INTERVALS.get(scope)
+    if estimator is None:
+        estimator = FEED_INTERVALS[scope] = FeedIntervalEstimator()
+    estimator.update(fed_at)
+    
+    expected_at = estimator.next_feed_at()
+    if expected_at is None or estimator.samples < NUDGE_MIN_SAMPLES:
+        return
+    
+    if estimator.variation > NUDGE_MAX_VARIATION:
+        NUDGE_WHEEL.cancel(scope)
+        return
+    
+    # The less regular the intervals, the earlier the nudge
+    lead = max(timedelta(minutes=NUDGE_LEAD_MINUTES), timedelta(seconds=estimator.stddev))
+    nudge_at = expected_at - lead
+    if nudge_at <= datetime.now(timezone.utc):
+        NUDGE_WHEEL.cancel(scope)
+        return
+    
+    NUDGE_WHEEL.schedule(scope, nudge_at, {
+        "user_id": user_id,
+        "baby_id": baby_id,
+        "expected_at": expected_at,
+    })
+
+
+async def get_feed_histogram(user_id: int) -> FeedSizeHistogram:
+    """Get a user's feed-size histogram, seeded from recent feeds once per process"""
+    if user_id not in FEED_HISTOGRAMS:
+        histogram = FeedSizeHistogram()
+        # Oldest first, so the most recent feeds carry the most weight
+        for amount_ml in reversed(await db.get_recent_feed_amounts(user_id)):
+            histogram.add(amount_ml)
+        FEED_HISTOGRAMS[user_id] = histogram
+    return FEED_HISTOGRAMS[user_id]
+
+
+async def get_daily_totals(user_id: int, baby_id: int | None, day: date):
+    """Get (n_feeds, total) for a day, shared by every caregiver of the same baby"""
+    scope = feed_scope(user_id, baby_id)
+    cached = DAILY_TOTALS.get(scope, day)
+    if cached is not None:
+        return cached
+
+    feeds = await db.get_daily_feeds(user_id, day, baby_id=baby_id)
+    
+    # Ensure feeds is a list and calculate totals
+    if feeds is None:
+        feeds = []
+    
+    total = sum(f.get("amount_ml", 0) for f in feeds)
+    n_feeds = len(feeds)
+    
+    # An empty result may be a swallowed read error, so don't keep it for the day
+    if n_feeds > 0:
+        DAILY_TOTALS.put(scope, day, n_feeds, total)
+    return n_feeds, total
+
+
+def cached_daily_totals(user_id: int, day: date):
+    """(n_feeds, total) from memory only, or None if the user's baby or totals aren't cached"""
+    if user_id not in USER_BABIES:
+        return None
+    return DAILY_TOTALS.get(feed_scope(user_id, USER_BABIES[user_id]), day)
+
+
+def format_today_summary(user_lang: str, n_feeds: int, total: int) -> str:
+    if n_feeds > 0:
+        # Calculate average
+        average = round(total / n_feeds, 1)
+        return get_message(user_lang, "today_with_feeds", 
+                           n_feeds=n_feeds, 
+                           total=total, 
+                           average=average)
+    return get_message(user_lang, "today_no_feeds")
+
+
 # ---------------------- Handlers ----------------------
+async def rate_limit_guard(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Runs before every other handler and enforces rate limits (overload is shed earlier, by the update processor)"""
+    user = update.effective_user
+    if user is None:
+        return
+    
+    limited = RATE_LIMITER.check(user.id)
+    if limited is None:
+        return
+    
+    logger.warning(f"Rate limited user {user.id} ({limited} budget)")
+    message = update.message
+    cached = cached_daily_totals(user.id, date.today())
+    if (cached and user.id in USER_LANGUAGES and message and message.text
+            and message.text.startswith("/today")):
+        # Serve /today from the shared daily totals, which every caregiver's feed invalidates
+        await reply(update, format_today_summary(USER_LANGUAGES[user.id], *cached))
+    elif RATE_LIMITER.should_warn(user.id, limited):
+        # The user isn't at fault when the global budget ran out
+        await reject_update(update, "bot_busy" if limited == GLOBAL_LIMITED else "rate_limited")
+    elif update.callback_query:
+        await update.callback_query.answer()
+    raise ApplicationHandlerStop
+
+
+async def reject_update(update: Update, message_key: str):
+    """Answer a rejected update without touching the database"""
+    user_lang = USER_LANGUAGES.get(update.effective_user.id) or detect_user_language(update)
+    text = get_message(user_lang, message_key)
+    try:
+        if update.callback_query:
+            await update.callback_query.answer(text)
+        elif update.message:
+            await reply(update, text)
+    except Exception as e:
+        logger.error(f"Error rejecting update from user {update.effective_user.id}: {e}")
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.info(f"Start command received from user {update.effective_user.id}")
     USERS.add(update.effective_user.id)
     
     # Get user language
-    user_lang = get_user_language(update)
+    user_lang = await get_user_language(update)
     message = get_message(user_lang, "start_message")
     
-    await update.message.reply_text(message)
+    await reply(update, message)
 
 
 async def feed(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.info(f"Feed command received from user {update.effective_user.id}")
     USERS.add(update.effective_user.id)
     
+    # Redelivered update (polling restart, network retry): already logged
+    idempotency_key = feed_idempotency_key(update.effective_chat.id, update.update_id)
+    if idempotency_key in RECENT_FEED_KEYS:
+        logger.info(f"Ignoring duplicate feed update {idempotency_key}")
+        return
+    
     # Get user language
-    user_lang = get_user_language(update)
+    user_lang = await get_user_language(update)
 
     if not context.args:
-        message = get_message(user_lang, "feed_usage")
-        await update.message.reply_text(message)
+        # Offer the user's usual amounts as one-tap buttons
+        amounts = (await get_feed_histogram(update.effective_user.id)).most_common(QUICK_FEED_BUTTONS)
+        if not amounts:
+            message = get_message(user_lang, "feed_usage")
+            await reply(update, message)
+            return
+        
+        keyboard = [[
+            InlineKeyboardButton(f"🍼 {amount_ml} ml", callback_data=f"feed:{amount_ml}")
+            for amount_ml in amounts
+        ]]
+        message = get_message(user_lang, "feed_quick_prompt")
+        await reply(update, message, reply_markup=InlineKeyboardMarkup(keyboard))
         return
 
     try:
         amount_ml = int(context.args[0])
     except ValueError:
         message = get_message(user_lang, "feed_invalid_number")
-        await update.message.reply_text(message)
+        await reply(update, message)
         return
 
+    await log_feed(update, user_lang, amount_ml, idempotency_key)
+
+
+async def handle_quick_feed_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Log a feed from a tap on the /feed quick-log keyboard"""
+    query = update.callback_query
+    await query.answer()
+    USERS.add(query.from_user.id)
+    
+    # One keyboard, one feed: every tap on the same keyboard message shares a key,
+    # so a double tap (or a tap after a restart) is rejected as a duplicate
+    idempotency_key = feed_idempotency_key(update.effective_chat.id, f"kb{query.message.message_id}")
+    if idempotency_key in RECENT_FEED_KEYS:
+        logger.info(f"Ignoring duplicate quick-log tap {idempotency_key}")
+        return
+    
+    # Remove the buttons so the keyboard no longer looks tappable
     try:
-        supabase.register_feed(update.effective_user.id, amount_ml)
-        
-        # Get today's feeds including the new one
-        feeds = supabase.get_daily_feeds(update.effective_user.id, date.today())
+        await query.edit_message_reply_markup(reply_markup=None)
+    except Exception as e:
+        logger.warning(f"Error removing quick-log keyboard for user {query.from_user.id}: {e}")
+    
+    amount_ml = int(query.data.split(":", 1)[1])
+    await log_feed(update, await get_user_language(update), amount_ml, idempotency_key)
+
+
+async def log_feed(update: Update, user_lang: str, amount_ml: int, idempotency_key: str,
+                   fed_at: datetime | None = None):
+    """Store a feed (now, or backdated to `fed_at`) and reply with today's summary"""
+    user_id = update.effective_user.id
+    baby_id = await get_user_baby(user_id)
+
+    try:
+        response = await db.register_feed(user_id, amount_ml, baby_id=baby_id,
+                                          idempotency_key=idempotency_key, fed_at=fed_at)
+        RECENT_FEED_KEYS.add(idempotency_key)
         
-        # Ensure feeds is a list and calculate totals
-        if feeds is None:
-            feeds = []
+        if response.data:
+            DAILY_TOTALS.invalidate(feed_scope(user_id, baby_id))
+            record_feed_time(user_id, baby_id, fed_at or datetime.now(timezone.utc))
+            
+            # Not seeded yet: the seed query will pick this feed up
+            if user_id in FEED_HISTOGRAMS:
+                FEED_HISTOGRAMS[user_id].add(amount_ml)
             
-        total = sum(f.get("amount_ml", 0) for f in feeds)
-        n_feeds = len(feeds)
+            # Let the other caregivers know on the next batched flush
+            if baby_id is not None:
+                await queue_caregiver_notification(update, baby_id, amount_ml, response)
+        else:
+            # Stored by an earlier delivery of this update; just confirm again
+            logger.info(f"Feed update {idempotency_key} was already stored")
+        
+        # Get today's totals including the new one
+        n_feeds, total = await get_daily_totals(user_id, baby_id, date.today())
         
         # Create confirmation message with daily summary
         if n_feeds > 0:
@@ -144,12 +465,12 @@ async def feed(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Fallback to simple confirmation if summary fails
             message = get_message(user_lang, "feed_logged", amount_ml=amount_ml)
         
-        await update.message.reply_text(message)
+        await reply(update, message)
         logger.info(f"Feed logged: {amount_ml} ml for user {update.effective_user.id}. Daily total: {total} ml ({n_feeds} feeds)")
     except Exception as e:
         logger.error(f"Error logging feed: {e}")
         message = get_message(user_lang, "feed_error")
-        await update.message.reply_text(message)
+        await reply(update, message)
 
 
 async def timezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -157,16 +478,16 @@ async def timezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     USERS.add(update.effective_user.id)
     
     # Get user language
-    user_lang = get_user_language(update)
+    user_lang = await get_user_language(update)
 
     if not context.args:
         # Show current timezone
-        current_tz = supabase.get_user_timezone(update.effective_user.id)
+        current_tz = await db.get_user_timezone(update.effective_user.id)
         if current_tz:
             message = get_message(user_lang, "timezone_current", timezone=current_tz)
         else:
             message = get_message(user_lang, "timezone_not_set")
-        await update.message.reply_text(message)
+        await reply(update, message)
         return
 
     timezone_str = context.args[0]
@@ -176,18 +497,68 @@ async def timezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         ZoneInfo(timezone_str)
     except Exception:
         message = get_message(user_lang, "timezone_invalid", timezone=timezone_str)
-        await update.message.reply_text(message)
+        await reply(update, message)
         return
 
     try:
-        supabase.set_user_timezone(update.effective_user.id, timezone_str)
+        await db.set_user_timezone(update.effective_user.id, timezone_str)
         message = get_message(user_lang, "timezone_set", timezone=timezone_str)
-        await update.message.reply_text(message)
+        await reply(update, message)
         logger.info(f"Timezone set to {timezone_str} for user {update.effective_user.id}")
     except Exception as e:
         logger.error(f"Error setting timezone: {e}")
         message = get_message(user_lang, "timezone_error")
-        await update.message.reply_text(message)
+        await reply(update, message)
+
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    logger.info(f"Export command received from user {update.effective_user.id}")
+    USERS.add(update.effective_user.id)
+    
+    # Get user language
+    user_lang = await get_user_language(update)
+    user_id = update.effective_user.id
+    
+    try:
+        # Archive files are read from disk, keep that off the event loop
+        feeds = await asyncio.to_thread(get_user_feed_history, user_id)
+    except Exception as e:
+        logger.error(f"Error exporting feeds for user {user_id}: {e}")
+        message = get_message(user_lang, "export_error")
+        await reply(update, message)
+        return
+    
+    if not feeds:
+        message = get_message(user_lang, "export_empty")
+        await reply(update, message)
+        return
+    
+    document = InputFile(feeds_to_csv(feeds).encode("utf-8"), filename="feeds.csv")
+    OUTBOUND.submit(
+        "send_document", INTERACTIVE,
+        chat_id=update.effective_chat.id,
+        document=document,
+        caption=get_message(user_lang, "export_caption", n_feeds=len(feeds)),
+    )
+    logger.info(f"Queued export of {len(feeds)} feeds for user {user_id}")
+
+
+def get_user_feed_history(user_id: int) -> list[dict]:
+    """All of a user's feeds: archived ones plus those still in the hot table"""
+    archived = FEED_ARCHIVE.read_user_feeds(user_id) if FEED_ARCHIVE else []
+    feeds = {}
+    for feed_row in archived + supabase.get_all_user_feeds(user_id):
+        # A feed can be in both if a compaction run stopped before deleting it
+        feeds[feed_row["id"]] = feed_row
+    return sorted(feeds.values(), key=lambda feed_row: str(feed_row.get(FEEDS_DATE_COLUMN, "")))
+
+
+def feeds_to_csv(feeds: list[dict]) -> str:
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=[FEEDS_DATE_COLUMN, "amount_ml", "baby_id"], extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(feeds)
+    return output.getvalue()
 
 
 async def today_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -195,36 +566,114 @@ async def today_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     USERS.add(update.effective_user.id)
     
     # Get user language
-    user_lang = get_user_language(update)
+    user_lang = await get_user_language(update)
     
     try:
-        # Get today's feeds for the user
-        feeds = supabase.get_daily_feeds(update.effective_user.id, date.today())
-        
-        # Ensure feeds is a list
-        if feeds is None:
-            feeds = []
-            
-        total = sum(f.get("amount_ml", 0) for f in feeds)
-        n_feeds = len(feeds)
-        
-        if n_feeds > 0:
-            # Calculate average
-            average = round(total / n_feeds, 1)
-            message = get_message(user_lang, "today_with_feeds", 
-                                n_feeds=n_feeds, 
-                                total=total, 
-                                average=average)
-        else:
-            message = get_message(user_lang, "today_no_feeds")
-            
-        await update.message.reply_text(message)
+        # Get today's totals for the user, or for their shared baby profile
+        user_id = update.effective_user.id
+        n_feeds, total = await get_daily_totals(user_id, await get_user_baby(user_id), date.today())
+        message = format_today_summary(user_lang, n_feeds, total)
+        await reply(update, message)
         logger.info(f"Today summary sent to user {update.effective_user.id}: {n_feeds} feeds, {total} ml")
         
     except Exception as e:
         logger.error(f"Error getting today's summary for user {update.effective_user.id}: {e}")
         message = get_message(user_lang, "today_error")
-        await update.message.reply_text(message)
+        await reply(update, message)
+
+
+async def baby_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    logger.info(f"Baby command received from user {update.effective_user.id}")
+    USERS.add(update.effective_user.id)
+    
+    # Get user language
+    user_lang = await get_user_language(update)
+    user_id = update.effective_user.id
+
+    if not context.args:
+        # Show the current shared profile
+        baby_id = await get_user_baby(user_id)
+        baby = await get_baby_profile(baby_id) if baby_id is not None else None
+        if baby:
+            message = get_message(user_lang, "baby_current",
+                                name=baby["name"],
+                                invite_code=baby["invite_code"],
+                                n_caregivers=len(await get_baby_caregivers(baby_id)))
+        else:
+            message = get_message(user_lang, "baby_not_set")
+        await reply(update, message)
+        return
+
+    action = context.args[0].lower()
+    
+    if action == "new" and len(context.args) > 1:
+        name = " ".join(context.args[1:])
+        baby = await db.create_baby(user_id, name, new_invite_code())
+        if not baby:
+            message = get_message(user_lang, "baby_error")
+            await reply(update, message)
+            return
+        
+        set_user_baby(user_id, baby)
+        message = get_message(user_lang, "baby_created", name=baby["name"], invite_code=baby["invite_code"])
+        await reply(update, message)
+        logger.info(f"Baby profile {baby['id']} created by user {user_id}")
+    elif action == "join" and len(context.args) == 2:
+        baby = await db.get_baby_by_invite_code(context.args[1])
+        if not baby:
+            message = get_message(user_lang, "baby_invalid_code", invite_code=context.args[1])
+            await reply(update, message)
+            return
+        
+        if await db.add_caregiver(baby["id"], user_id) is None:
+            message = get_message(user_lang, "baby_error")
+            await reply(update, message)
+            return
+        
+        set_user_baby(user_id, baby)
+        message = get_message(user_lang, "baby_joined", name=baby["name"])
+        await reply(update, message)
+        logger.info(f"User {user_id} joined baby profile {baby['id']}")
+    else:
+        message = get_message(user_lang, "baby_usage")
+        await reply(update, message)
+
+
+def set_user_baby(user_id: int, baby: dict):
+    """Point a user at a baby profile, refreshing the cached membership"""
+    previous_baby_id = USER_BABIES.get(user_id)
+    if previous_baby_id is not None:
+        BABY_CAREGIVERS.pop(previous_baby_id, None)
+        DAILY_TOTALS.invalidate(feed_scope(user_id, previous_baby_id))
+    
+    USER_BABIES[user_id] = baby["id"]
+    BABY_PROFILES[baby["id"]] = baby
+    BABY_CAREGIVERS.pop(baby["id"], None)
+    DAILY_TOTALS.invalidate(feed_scope(user_id, baby["id"]))
+    DAILY_TOTALS.invalidate(feed_scope(user_id, None))
+
+
+async def queue_caregiver_notification(update: Update, baby_id: int, amount_ml: int, response):
+    """Queue a new feed for every other caregiver of the baby"""
+    user_id = update.effective_user.id
+    recipients = [caregiver for caregiver in await get_baby_caregivers(baby_id) if caregiver != user_id]
+    if not recipients:
+        return
+    
+    # Deduplicate on the stored row when available, else on the incoming message
+    rows = getattr(response, "data", None) or []
+    if rows and "id" in rows[0]:
+        event_key = f"feed:{rows[0]['id']}"
+    else:
+        event_key = f"update:{update.update_id}"
+    
+    baby = await get_baby_profile(baby_id)
+    payload = {
+        "baby_name": baby["name"] if baby else "",
+        "caregiver": update.effective_user.first_name,
+        "amount_ml": amount_ml,
+    }
+    CAREGIVER_FANOUT.enqueue(recipients, event_key, payload)
 
 
 async def setup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -232,19 +681,24 @@ async def setup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     USERS.add(update.effective_user.id)
     
     # Get user language
-    user_lang = get_user_language(update)
+    user_lang = await get_user_language(update)
     
     # Create inline keyboard with setup options
+    nudges_key = "setup_nudges_button_on" if await get_user_nudges(update.effective_user.id) else "setup_nudges_button_off"
     keyboard = [
         [InlineKeyboardButton(
             get_message(user_lang, "setup_reminder_button"), 
             callback_data="setup_reminder"
+        )],
+        [InlineKeyboardButton(
+            get_message(user_lang, nudges_key),
+            callback_data="setup_nudges"
         )]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     message = get_message(user_lang, "setup_menu")
-    await update.message.reply_text(message, reply_markup=reply_markup)
+    await reply(update, message, reply_markup=reply_markup)
 
 
 async def handle_setup_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -253,11 +707,11 @@ async def handle_setup_callback(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
     
     user_id = query.from_user.id
-    user_lang = supabase.get_user_language(user_id) or "en"
+    user_lang = await lookup_user_language(user_id)
     
     if query.data == "setup_reminder":
         # Show current reminder time if set
-        current_time = supabase.get_user_reminder_time(user_id)
+        current_time = await db.get_user_reminder_time(user_id)
         if current_time:
             current_msg = get_message(user_lang, "setup_reminder_current", time=current_time)
             await query.edit_message_text(current_msg)
@@ -267,56 +721,117 @@ async def handle_setup_callback(update: Update, context: ContextTypes.DEFAULT_TY
         
         # Ask for new time
         message = get_message(user_lang, "setup_reminder_prompt")
-        await context.bot.send_message(chat_id=user_id, text=message)
+        OUTBOUND.submit("send_message", INTERACTIVE, chat_id=user_id, text=message)
+    elif query.data == "setup_nudges":
+        # Toggle "feed due" nudges
+        enabled = not await get_user_nudges(user_id)
+        if await db.set_user_nudges(user_id, enabled) is None:
+            await query.edit_message_text(get_message(user_lang, "setup_nudges_error"))
+            return
+        
+        USER_NUDGES[user_id] = enabled
+        message_key = "setup_nudges_enabled" if enabled else "setup_nudges_disabled"
+        await query.edit_message_text(get_message(user_lang, message_key))
+        logger.info(f"Feed nudges {'enabled' if enabled else 'disabled'} for user {user_id}")
 
 
-async def handle_reminder_time_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle user input for reminder time"""
-    user_id = update.effective_user.id
-    user_lang = get_user_language(update)
-    
-    # Check if user is in the right state
-    if USER_STATES.get(user_id) != "waiting_reminder_time":
+async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Route plain text messages through the precompiled dispatch table"""
+    # Edits and channel posts carry no update.message, and an edit must not log a second feed
+    if update.message is None:
         return
     
-    time_input = update.message.text.strip()
+    text = update.message.text.strip()
+    state = USER_STATES.get(update.effective_user.id)
+    
+    # Outside a conversation only messages starting with a digit can match
+    if state is None and not text[:1].isdigit():
+        return
     
-    # Validate time format (HH:MM)
-    import re
-    time_pattern = r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$'
+    for pattern, route_state, handler in TEXT_ROUTES:
+        if route_state != state:
+            continue
+        match = pattern.match(text)
+        if match:
+            await handler(update, context, match)
+            return
     
-    if not re.match(time_pattern, time_input):
+    if state == "waiting_reminder_time":
+        user_lang = await get_user_language(update)
         message = get_message(user_lang, "setup_reminder_invalid")
-        await update.message.reply_text(message)
+        await reply(update, message)
+
+
+async def handle_text_feed(update: Update, context: ContextTypes.DEFAULT_TYPE, match: re.Match):
+    """Log a feed sent as plain text, e.g. "120", "120ml" or "120 14:30" (backdated)"""
+    user_id = update.effective_user.id
+    USERS.add(user_id)
+    
+    idempotency_key = feed_idempotency_key(update.effective_chat.id, update.update_id)
+    if idempotency_key in RECENT_FEED_KEYS:
+        logger.info(f"Ignoring duplicate feed update {idempotency_key}")
+        return
+    
+    amount_ml = int(match.group("amount"))
+    if amount_ml <= 0:
         return
     
+    fed_at = None
+    if match.groupdict().get("hour") is not None:
+        # Most recent HH:MM in the user's timezone
+        user_tz = await get_user_timezone(user_id)
+        now = datetime.now(user_tz)
+        fed_at = now.replace(hour=int(match.group("hour")), minute=int(match.group("minute")),
+                             second=0, microsecond=0)
+        if fed_at > now:
+            fed_at -= timedelta(days=1)
+    
+    logger.info(f"Text feed received from user {user_id}: {amount_ml} ml")
+    await log_feed(update, await get_user_language(update), amount_ml, idempotency_key, fed_at=fed_at)
+
+
+async def handle_reminder_time_input(update: Update, context: ContextTypes.DEFAULT_TYPE, match: re.Match):
+    """Handle user input for reminder time"""
+    user_id = update.effective_user.id
+    user_lang = await get_user_language(update)
+    time_input = match.group(0)
+    
     try:
         # Save the reminder time
-        supabase.set_user_reminder_time(user_id, time_input)
+        await db.set_user_reminder_time(user_id, time_input)
         
         # Clear user state
         if user_id in USER_STATES:
             del USER_STATES[user_id]
         
         # Reschedule the reminder for this user
-        reschedule_user_reminder(context.application, user_id)
+        await reschedule_user_reminder(context.application, user_id)
         
         message = get_message(user_lang, "setup_reminder_set", time=time_input)
-        await update.message.reply_text(message)
+        await reply(update, message)
         
         logger.info(f"Reminder time set to {time_input} for user {user_id}")
         
     except Exception as e:
         logger.error(f"Error setting reminder time for user {user_id}: {e}")
         message = get_message(user_lang, "setup_reminder_error")
-        await update.message.reply_text(message)
+        await reply(update, message)
+
 
+# Free-text routes as (pattern, required conversation state, handler), tried in order
+TEXT_ROUTES = [
+    (re.compile(r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$'), "waiting_reminder_time", handle_reminder_time_input),
+    (re.compile(r'^(?P<amount>\d{1,3})\s*(?:ml)?\s+(?P<hour>[0-1]?[0-9]|2[0-3]):(?P<minute>[0-5][0-9])$', re.IGNORECASE),
+     None, handle_text_feed),
+    (re.compile(r'^(?P<amount>\d{1,3})\s*(?:ml)?$', re.IGNORECASE), None, handle_text_feed),
+]
 
-def reschedule_user_reminder(app, user_id: int):
+
+async def reschedule_user_reminder(app, user_id: int):
     """Reschedule reminder for a specific user"""
     try:
-        reminder_time = supabase.get_user_reminder_time(user_id)
-        user_tz = get_user_timezone(user_id)
+        reminder_time = await db.get_user_reminder_time(user_id)
+        user_tz = await get_user_timezone(user_id)
         
         # Create a unique job name for this user
         job_name = f"daily_summary_{user_id}"
@@ -358,12 +873,10 @@ async def send_daily_summary_to_user(context: ContextTypes.DEFAULT_TYPE):
     job_context = context.job.data
     user_id = job_context['user_id']
     
-    user_tz = get_user_timezone(user_id)
-    user_lang = supabase.get_user_language(user_id) or "en"
+    user_lang = await lookup_user_language(user_id)
     
-    feeds = supabase.get_daily_feeds(user_id, date.today())
-    total = sum(f.get("amount_ml", 0) for f in feeds)
-    n_feeds = len(feeds)
+    # Caregivers of the same baby share one aggregate instead of recomputing it
+    n_feeds, total = await get_daily_totals(user_id, await get_user_baby(user_id), date.today())
     
     if n_feeds > 0:
         text = get_message(user_lang, "summary_with_feeds", n_feeds=n_feeds, total=total)
@@ -371,18 +884,84 @@ async def send_daily_summary_to_user(context: ContextTypes.DEFAULT_TYPE):
         text = get_message(user_lang, "summary_no_feeds")
         
     try:
-        await context.bot.send_message(chat_id=user_id, text=text)
+        await OUTBOUND.send_message(user_id, text, priority=BULK)
         logger.info(f"Daily summary sent to user {user_id}: {n_feeds} feeds, {total} ml")
     except Exception as e:
         logger.error(f"Error sending daily summary to user {user_id}: {e}")
 
 
-def schedule_user_reminders(app):
+async def flush_caregiver_fanout(context: ContextTypes.DEFAULT_TYPE):
+    """Send each caregiver one message with every feed queued since the last flush"""
+    batches = CAREGIVER_FANOUT.drain()
+    sends = []
+    for recipient_id, events in batches.items():
+        user_lang = await lookup_user_language(recipient_id)
+        
+        lines = [get_message(user_lang, "caregiver_feed_line", **event) for event in events]
+        text = get_message(user_lang, "caregiver_feeds_header") + "\n" + "\n".join(lines)
+        sends.append(OUTBOUND.send_message(recipient_id, text, priority=BULK))
+    
+    # Queue them all at once and let the dispatcher pace delivery
+    results = await asyncio.gather(*sends, return_exceptions=True)
+    for (recipient_id, events), result in zip(batches.items(), results):
+        if isinstance(result, Exception):
+            logger.error(f"Error sending caregiver notifications to user {recipient_id}: {result}")
+        else:
+            logger.info(f"Sent {len(events)} caregiver feed notifications to user {recipient_id}")
+
+
+async def tick_nudge_wheel(context: ContextTypes.DEFAULT_TYPE):
+    """Advance the shared nudge timers and send the "feed due" nudges that fired"""
+    for nudge in NUDGE_WHEEL.advance(datetime.now(timezone.utc)):
+        baby_id = nudge["baby_id"]
+        recipients = await get_baby_caregivers(baby_id) if baby_id is not None else [nudge["user_id"]]
+        
+        for recipient_id in recipients:
+            if not await get_user_nudges(recipient_id):
+                continue
+            
+            user_lang = await lookup_user_language(recipient_id)
+            expected_at = nudge["expected_at"].astimezone(await get_user_timezone(recipient_id))
+            text = get_message(user_lang, "nudge_next_feed", time=expected_at.strftime("%H:%M"))
+            
+            # Don't hold up the tick waiting for delivery
+            OUTBOUND.submit("send_message", BULK, chat_id=recipient_id, text=text)
+            logger.info(f"Feed nudge queued for user {recipient_id} (expected {expected_at:%H:%M})")
+
+
+async def run_feed_retention(context: ContextTypes.DEFAULT_TYPE):
+    """Compact raw feeds older than RETENTION_DAYS into daily rollups and archive files"""
+    try:
+        # Batch database and file work, keep it off the event loop
+        compacted = await asyncio.to_thread(compact_old_feeds, supabase, FEED_ARCHIVE, RETENTION_DAYS)
+        logger.info(f"Feed retention: compacted {compacted} feeds older than {RETENTION_DAYS} days")
+    except Exception as e:
+        logger.error(f"Error compacting old feeds: {e}")
+
+
+async def log_update_metrics(context: ContextTypes.DEFAULT_TYPE):
+    """Periodically log update and outbound queue metrics"""
+    stats = UPDATE_PROCESSOR.snapshot(reset=True)
+    logger.info(
+        f"Update processor: depth {stats['queue_depth']} (max {stats['max_queue_depth']}), "
+        f"running {stats['running']}, users queued {stats['queued_users']}, "
+        f"wait avg {stats['average_wait_ms']} ms (max {stats['max_wait_ms']} ms), "
+        f"processed {stats['processed']}, shed {stats['shed']}"
+    )
+    
+    outbound = OUTBOUND.snapshot()
+    logger.info(
+        f"Outbound: queued {outbound['queued']}, delayed {outbound['delayed']}, "
+        f"sent {outbound['sent']}, failed {outbound['failed']}, flood waits {outbound['retry_after']}"
+    )
+
+
+async def schedule_user_reminders(app):
     """Schedule daily reminders for all users based on their individual settings"""
     for user_id in USERS:
         try:
-            reminder_time = supabase.get_user_reminder_time(user_id)
-            user_tz = get_user_timezone(user_id)
+            reminder_time = await db.get_user_reminder_time(user_id)
+            user_tz = await get_user_timezone(user_id)
             
             if reminder_time:
                 # Parse the time string (HH:MM)
@@ -427,29 +1006,96 @@ def schedule_user_reminders(app):
 
 
 # ---------------------- Main ----------------------
+def health_metrics() -> dict:
+    """Everything the health endpoint reports"""
+    return {
+        "loop_lag": LOOP_MONITOR.percentiles(),
+        "blocking_events": LOOP_MONITOR.blocking_events,
+        "updates": UPDATE_PROCESSOR.snapshot(),
+        "outbound": OUTBOUND.snapshot(),
+    }
+
+
+async def post_init(app):
+    global HEALTH_SERVER
+    await OUTBOUND.start(app.bot)
+    await LOOP_MONITOR.start()
+    
+    # Schedule individual reminders for users
+    await schedule_user_reminders(app)
+    
+    if HEALTH_PORT:
+        HEALTH_SERVER = HealthServer(int(HEALTH_PORT), health_metrics, lambda: LOOP_MONITOR.healthy)
+        await HEALTH_SERVER.start()
+
+
+async def post_shutdown(app):
+    if HEALTH_SERVER:
+        await HEALTH_SERVER.stop()
+    await LOOP_MONITOR.stop()
+    await OUTBOUND.stop()
+
+
 def main():
     app = (
         ApplicationBuilder()
         .token(TELEGRAM_BOT_TOKEN)
         .job_queue(JobQueue())
+        .concurrent_updates(UPDATE_PROCESSOR)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
         .build()
     )
 
+    # Rate limiting runs first, in its own group
+    app.add_handler(TypeHandler(Update, rate_limit_guard), group=-1)
+
     # Handlers
     app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("feed", feed))
+    # New messages only: editing "/feed 120" must not log a second feed
+    app.add_handler(CommandHandler("feed", feed, filters=filters.UpdateType.MESSAGE))
     app.add_handler(CommandHandler("today", today_command))
     app.add_handler(CommandHandler("setup", setup_command))
     app.add_handler(CommandHandler("timezone", timezone_command))
+    app.add_handler(CommandHandler("baby", baby_command))
+    app.add_handler(CommandHandler("export", export_command))
     
-    # Callback query handler for inline buttons
-    app.add_handler(CallbackQueryHandler(handle_setup_callback))
+    # Callback query handlers for inline buttons
+    app.add_handler(CallbackQueryHandler(handle_quick_feed_callback, pattern=r"^feed:\d+$"))
+    app.add_handler(CallbackQueryHandler(handle_setup_callback, pattern=r"^setup_"))
     
-    # Message handler for reminder time input
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_reminder_time_input))
+    # Message handler for plain text: feeds and the reminder time setup step
+    app.add_handler(MessageHandler(filters.UpdateType.MESSAGE & filters.TEXT & ~filters.COMMAND, handle_text_message))
 
-    # Schedule individual reminders for users
-    schedule_user_reminders(app)
+    # Batched caregiver notifications
+    app.job_queue.run_repeating(
+        flush_caregiver_fanout,
+        interval=FANOUT_INTERVAL_SECONDS,
+        name="caregiver_fanout"
+    )
+
+    # One shared timer wheel for every "feed due" nudge
+    app.job_queue.run_repeating(
+        tick_nudge_wheel,
+        interval=NUDGE_WHEEL.tick_seconds,
+        name="nudge_wheel"
+    )
+
+    # Nightly hot/cold retention for the feeds table, only with an archive to move feeds to
+    if FEED_ARCHIVE:
+        app.job_queue.run_daily(
+            run_feed_retention,
+            time=time(hour=3, minute=30, tzinfo=timezone.utc),
+            name="feed_retention"
+        )
+        logger.info(f"Feed retention enabled: feeds older than {RETENTION_DAYS} days move to {ARCHIVE_DIR}")
+
+    # Update processor metrics
+    app.job_queue.run_repeating(
+        log_update_metrics,
+        interval=METRICS_INTERVAL_SECONDS,
+        name="update_metrics"
+    )
 
     logger.info("Starting bot...")
     app.run_polling()
@@ -0,0 +1,71 @@
+import logging
+import secrets
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+
+def new_invite_code() -> str:
+    """Generate a short invite code caregivers can share to join a baby profile"""
+    # 64 random bits: joining reveals the baby's feeds, so codes must not be guessable
+    return secrets.token_urlsafe(8)
+
+
+def feed_scope(user_id: int, baby_id: int | None) -> str:
+    """Key feeds are aggregated under: the shared baby profile, or the user alone"""
+    if baby_id is not None:
+        return f"baby:{baby_id}"
+    return f"user:{user_id}"
+
+
+class CaregiverFanout:
+    """
+    Batched, deduplicated queue of feed notifications for caregivers.
+
+    New feeds are queued per recipient and delivered together on the next
+    flush, so a burst of feeds results in one message per caregiver. A feed
+    queued twice for the same recipient is only delivered once.
+    """
+
+    def __init__(self):
+        # recipient user_id -> {event key -> payload}, kept in insertion order
+        self._pending: dict[int, dict[str, dict]] = {}
+
+    def enqueue(self, recipient_ids, event_key: str, payload: dict):
+        """Queue an event for each recipient, ignoring duplicates"""
+        for recipient_id in recipient_ids:
+            self._pending.setdefault(recipient_id, {}).setdefault(event_key, payload)
+
+    def drain(self) -> dict[int, list[dict]]:
+        """Take every pending event, grouped by recipient"""
+        pending, self._pending = self._pending, {}
+        return {recipient_id: list(events.values()) for recipient_id, events in pending.items()}
+
+    def __len__(self):
+        return sum(len(events) for events in self._pending.values())
+
+
+class DailyAggregates:
+    """
+    Per-scope daily totals (number of feeds, total ml).
+
+    Caregivers sharing a baby read the same entry, so the aggregate is
+    computed once per baby and reused for every caregiver until a new feed
+    invalidates it.
+    """
+
+    def __init__(self):
+        self._totals: dict[str, tuple[date, int, int]] = {}
+
+    def get(self, scope: str, day: date):
+        """Return (n_feeds, total) for the scope and day, or None if not cached"""
+        entry = self._totals.get(scope)
+        if entry and entry[0] == day:
+            return entry[1], entry[2]
+        return None
+
+    def put(self, scope: str, day: date, n_feeds: int, total: int):
+        self._totals[scope] = (day, n_feeds, total)
+
+    def invalidate(self, scope: str):
+        self._totals.pop(scope, None)
@@ -0,0 +1,58 @@
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HealthServer:
+    """
+    Minimal HTTP server for health and readiness probes.
+
+    GET /health always answers 200 with the current metrics; GET /ready
+    answers 503 while `ready()` returns False. `metrics()` returns a
+    JSON-serializable dict.
+    """
+
+    def __init__(self, port: int, metrics, ready):
+        self.port = port
+        self.metrics = metrics
+        self.ready = ready
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, host="0.0.0.0", port=self.port)
+        logger.info(f"Health endpoint listening on port {self.port}")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            parts = request_line.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else "/"
+
+            if path == "/health":
+                status, body = 200, self.metrics()
+            elif path == "/ready":
+                ready = self.ready()
+                status, body = (200 if ready else 503), {"ready": ready, **self.metrics()}
+            else:
+                status, body = 404, {"error": "not found"}
+
+            payload = json.dumps(body).encode()
+            reason = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}[status]
+            writer.write(
+                f"HTTP/1.1 {status} {reason}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.warning(f"Error answering health request: {e}")
+        finally:
+            writer.close()
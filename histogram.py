@@ -0,0 +1,30 @@
+class FeedSizeHistogram:
+    """
+    Recency-weighted count of the amounts a user logs, kept up to date on each insert.
+
+    Every insert decays the existing weights by `decay`, so amounts the user
+    has moved away from (a growing baby drinks more) fade out. Only
+    `max_bins` distinct amounts are tracked; when a new amount doesn't fit,
+    the one with the lowest weight is dropped, which is never the amount
+    added last.
+    """
+
+    def __init__(self, max_bins: int = 24, decay: float = 0.95):
+        self.max_bins = max_bins
+        self.decay = decay
+        self._weights: dict[int, float] = {}
+
+    def add(self, amount_ml: int):
+        for amount in self._weights:
+            self._weights[amount] *= self.decay
+        if amount_ml not in self._weights and len(self._weights) >= self.max_bins:
+            del self._weights[min(self._weights, key=self._weights.get)]
+        self._weights[amount_ml] = self._weights.get(amount_ml, 0.0) + 1.0
+
+    def most_common(self, n: int = 4) -> list[int]:
+        """The `n` most logged amounts, recent feeds counting more, smallest first"""
+        top = sorted(self._weights, key=self._weights.get, reverse=True)[:n]
+        return sorted(top)
+
+    def __len__(self):
+        return len(self._weights)
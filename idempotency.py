@@ -0,0 +1,38 @@
+import time
+from collections import OrderedDict
+
+
+def feed_idempotency_key(chat_id: int, source: int | str) -> str:
+    """Key identifying what a feed was logged from: an update id, or a quick-log keyboard"""
+    return f"{chat_id}:{source}"
+
+
+class RecentKeys:
+    """
+    Sliding window of recently processed idempotency keys.
+
+    Catches redelivered updates in memory before they reach the database;
+    the unique constraint on feeds.idempotency_key remains the source of
+    truth once a key has aged out of the window (or after a restart).
+    """
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._keys: OrderedDict[str, float] = OrderedDict()
+
+    def _expire(self, now: float):
+        while self._keys:
+            key, seen_at = next(iter(self._keys.items()))
+            if now - seen_at < self.ttl_seconds and len(self._keys) <= self.max_size:
+                break
+            self._keys.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        self._expire(time.monotonic())
+        return key in self._keys
+
+    def add(self, key: str):
+        self._keys[key] = time.monotonic()
+        self._keys.move_to_end(key)
+        self._expire(time.monotonic())
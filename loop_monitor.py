@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class LoopLagMonitor:
+    """
+    Watchdog for blocking calls in async handlers.
+
+    A task on the event loop sleeps for `interval` and records how late it
+    wakes up (the scheduling lag). A separate thread watches the task's
+    heartbeat: when the loop has been stuck for longer than `threshold` it
+    samples the loop thread's stack, so the blocking call is logged while it
+    is still running.
+    """
+
+    def __init__(self, interval: float = 0.5, threshold: float = 0.25, window: int = 1200):
+        self.interval = interval
+        self.threshold = threshold
+        self._lags: deque[float] = deque(maxlen=window)
+        self._heartbeat = time.monotonic()
+        self._reported_heartbeat = None
+        self._loop_thread_id = None
+        self._task: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+        self.blocking_events = 0
+
+    async def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Event loop monitor started (threshold {self.threshold * 1000:.0f} ms)")
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _measure(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            self._lags.append(lag)
+            self._heartbeat = now
+            if lag > self.threshold:
+                logger.warning(f"Event loop lag: {lag * 1000:.0f} ms")
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled <= self.threshold or self._reported_heartbeat == heartbeat:
+                continue
+
+            # Report each stall once, while it is still happening
+            self._reported_heartbeat = heartbeat
+            self.blocking_events += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            culprit = self._find_culprit(stack)
+            logger.warning(
+                f"Event loop blocked for {stalled * 1000:.0f} ms in {culprit.name} "
+                f"({os.path.basename(culprit.filename)}:{culprit.lineno}); stack:\n"
+                + "".join(traceback.format_list(stack[-8:]))
+            )
+
+    @staticmethod
+    def _find_culprit(stack):
+        """Innermost frame in the bot's own code, else the innermost frame"""
+        for entry in reversed(stack):
+            filename = os.path.abspath(entry.filename)
+            if filename.startswith(PROJECT_DIR) and filename != os.path.abspath(__file__):
+                return entry
+        return stack[-1]
+
+    def percentiles(self) -> dict:
+        """Lag percentiles over the recent window, in milliseconds"""
+        lags = sorted(self._lags)
+        if not lags:
+            return {"p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+        def pick(q):
+            return round(lags[min(int(q * len(lags)), len(lags) - 1)] * 1000, 1)
+
+        return {
+            "p50_ms": pick(0.50),
+            "p90_ms": pick(0.90),
+            "p99_ms": pick(0.99),
+            "max_ms": round(lags[-1] * 1000, 1),
+        }
+
+    @property
+    def healthy(self) -> bool:
+        """Ready unless the loop is stuck right now or p99 lag is over the threshold"""
+        stuck = time.monotonic() - self._heartbeat - self.interval > self.threshold
+        return not stuck and self.percentiles()["p99_ms"] <= self.threshold * 1000
@@ -36,6 +36,37 @@ MESSAGES = {
         "setup_reminder_set": "✅ Daily reminder set to: {time} 🕐\n\n📅 You'll receive your daily summary at this time every day!",
         "setup_reminder_current": "🕐 Your current daily reminder time is: {time}",
         "setup_reminder_error": "😔 Sorry, there was an error setting your reminder time. Please try again.",
+        
+        # Baby command
+        "baby_usage": "👶 Usage:\n/baby - show your shared baby profile\n/baby new <name> - create a profile to share with other caregivers\n/baby join <code> - join a profile with its invite code",
+        "baby_not_set": "👶 You're logging feeds just for yourself.\n\n👨‍👩‍👧 Use /baby new <name> to create a shared profile, or /baby join <code> to join one.",
+        "baby_current": "👶 Logging feeds for: {name}\n👨‍👩‍👧 Caregivers: {n_caregivers}\n🔑 Invite code: {invite_code}",
+        "baby_created": "✅ Profile created for {name} 👶\n\n🔑 Share this invite code with other caregivers: {invite_code}\n📍 They can join with: /baby join {invite_code}",
+        "baby_joined": "✅ You joined {name}'s profile 👶\n\n🍼 Feeds logged by any caregiver now count towards the same daily summary.",
+        "baby_invalid_code": "❌ No baby profile found with invite code: {invite_code}",
+        "baby_error": "😔 Sorry, there was an error updating the baby profile. Please try again.",
+        "caregiver_feeds_header": "👨‍👩‍👧 New feeds from other caregivers:",
+        "caregiver_feed_line": "🍼 {baby_name}: {amount_ml} ml ({caregiver})",
+        
+        # Rate limiting
+        "rate_limited": "🐢 Slow down a little! Too many requests, please try again in a minute.",
+        "bot_busy": "⏳ The bot is very busy right now. Please try again in a moment.",
+        
+        # Feed nudges
+        "setup_nudges_button_on": "🔔 \"Feed due\" nudges: on",
+        "setup_nudges_button_off": "🔕 \"Feed due\" nudges: off",
+        "setup_nudges_enabled": "🔔 \"Feed due\" nudges enabled!\n\n🍼 Once a few feeds are logged, I'll let you know shortly before the next one is likely due.",
+        "setup_nudges_disabled": "🔕 \"Feed due\" nudges disabled.",
+        "setup_nudges_error": "😔 Sorry, there was an error updating your nudges. Please try again.",
+        "nudge_next_feed": "🍼 Next feed likely around {time} ⏰",
+        
+        # Quick-log keyboard
+        "feed_quick_prompt": "🍼 How much did the baby drink?\n\n👆 Tap an amount, or use /feed <ml> for a different one",
+        
+        # Export command
+        "export_caption": "📦 Your feed history: {n_feeds} feeds",
+        "export_empty": "📭 There are no feeds to export yet.\n💡 Use /feed <ml> to log your first bottle!",
+        "export_error": "😔 Sorry, there was an error exporting your feeds. Please try again.",
     },
     
     "es": {
@@ -73,6 +104,37 @@ MESSAGES = {
         "setup_reminder_set": "✅ Recordatorio diario configurado a las: {time} 🕐\n\n📅 ¡Recibirás tu resumen diario a esta hora todos los días!",
         "setup_reminder_current": "🕐 Tu hora actual del recordatorio diario es: {time}",
         "setup_reminder_error": "😔 Lo siento, hubo un error al configurar tu hora de recordatorio. Por favor, inténtalo de nuevo.",
+        
+        # Baby command
+        "baby_usage": "👶 Uso:\n/baby - ver tu perfil de bebé compartido\n/baby new <nombre> - crear un perfil para compartir con otros cuidadores\n/baby join <código> - unirte a un perfil con su código de invitación",
+        "baby_not_set": "👶 Estás registrando tomas solo para ti.\n\n👨‍👩‍👧 Usa /baby new <nombre> para crear un perfil compartido, o /baby join <código> para unirte a uno.",
+        "baby_current": "👶 Registrando tomas para: {name}\n👨‍👩‍👧 Cuidadores: {n_caregivers}\n🔑 Código de invitación: {invite_code}",
+        "baby_created": "✅ Perfil creado para {name} 👶\n\n🔑 Comparte este código de invitación con otros cuidadores: {invite_code}\n📍 Pueden unirse con: /baby join {invite_code}",
+        "baby_joined": "✅ Te has unido al perfil de {name} 👶\n\n🍼 Las tomas registradas por cualquier cuidador cuentan ahora en el mismo resumen diario.",
+        "baby_invalid_code": "❌ No se encontró ningún perfil con el código de invitación: {invite_code}",
+        "baby_error": "😔 Lo siento, hubo un error al actualizar el perfil del bebé. Por favor, inténtalo de nuevo.",
+        "caregiver_feeds_header": "👨‍👩‍👧 Nuevas tomas de otros cuidadores:",
+        "caregiver_feed_line": "🍼 {baby_name}: {amount_ml} ml ({caregiver})",
+        
+        # Rate limiting
+        "rate_limited": "🐢 ¡Más despacio! Demasiadas solicitudes, inténtalo de nuevo en un minuto.",
+        "bot_busy": "⏳ El bot está muy ocupado ahora mismo. Inténtalo de nuevo en un momento.",
+        
+        # Feed nudges
+        "setup_nudges_button_on": "🔔 Avisos de próxima toma: activados",
+        "setup_nudges_button_off": "🔕 Avisos de próxima toma: desactivados",
+        "setup_nudges_enabled": "🔔 ¡Avisos de próxima toma activados!\n\n🍼 Cuando haya algunas tomas registradas, te avisaré poco antes de la siguiente toma probable.",
+        "setup_nudges_disabled": "🔕 Avisos de próxima toma desactivados.",
+        "setup_nudges_error": "😔 Lo siento, hubo un error al actualizar tus avisos. Por favor, inténtalo de nuevo.",
+        "nudge_next_feed": "🍼 Próxima toma probablemente sobre las {time} ⏰",
+        
+        # Quick-log keyboard
+        "feed_quick_prompt": "🍼 ¿Cuánto ha tomado el bebé?\n\n👆 Toca una cantidad, o usa /feed <ml> para otra distinta",
+        
+        # Export command
+        "export_caption": "📦 Tu historial de tomas: {n_feeds} tomas",
+        "export_empty": "📭 Aún no hay tomas para exportar.\n💡 ¡Usa /feed <ml> para registrar tu primer biberón!",
+        "export_error": "😔 Lo siento, hubo un error al exportar tus tomas. Por favor, inténtalo de nuevo.",
     },
     
     "fr": {
@@ -110,6 +172,37 @@ MESSAGES = {
         "setup_reminder_set": "✅ Rappel quotidien configuré à: {time} 🕐\n\n📅 Vous recevrez votre résumé quotidien à cette heure chaque jour!",
         "setup_reminder_current": "🕐 Votre heure actuelle de rappel quotidien est: {time}",
         "setup_reminder_error": "😔 Désolé, il y a eu une erreur lors de la configuration de votre heure de rappel. Veuillez réessayer.",
+        
+        # Baby command
+        "baby_usage": "👶 Usage:\n/baby - voir votre profil de bébé partagé\n/baby new <nom> - créer un profil à partager avec d'autres personnes\n/baby join <code> - rejoindre un profil avec son code d'invitation",
+        "baby_not_set": "👶 Vous enregistrez les alimentations pour vous seul.\n\n👨‍👩‍👧 Utilisez /baby new <nom> pour créer un profil partagé, ou /baby join <code> pour en rejoindre un.",
+        "baby_current": "👶 Alimentations enregistrées pour: {name}\n👨‍👩‍👧 Personnes: {n_caregivers}\n🔑 Code d'invitation: {invite_code}",
+        "baby_created": "✅ Profil créé pour {name} 👶\n\n🔑 Partagez ce code d'invitation avec les autres personnes: {invite_code}\n📍 Elles peuvent rejoindre avec: /baby join {invite_code}",
+        "baby_joined": "✅ Vous avez rejoint le profil de {name} 👶\n\n🍼 Les alimentations enregistrées par chaque personne comptent maintenant dans le même résumé quotidien.",
+        "baby_invalid_code": "❌ Aucun profil trouvé avec le code d'invitation: {invite_code}",
+        "baby_error": "😔 Désolé, il y a eu une erreur lors de la mise à jour du profil. Veuillez réessayer.",
+        "caregiver_feeds_header": "👨‍👩‍👧 Nouvelles alimentations des autres personnes:",
+        "caregiver_feed_line": "🍼 {baby_name}: {amount_ml} ml ({caregiver})",
+        
+        # Rate limiting
+        "rate_limited": "🐢 Doucement! Trop de demandes, veuillez réessayer dans une minute.",
+        "bot_busy": "⏳ Le bot est très occupé en ce moment. Veuillez réessayer dans un instant.",
+        
+        # Feed nudges
+        "setup_nudges_button_on": "🔔 Alertes de prochaine alimentation: activées",
+        "setup_nudges_button_off": "🔕 Alertes de prochaine alimentation: désactivées",
+        "setup_nudges_enabled": "🔔 Alertes de prochaine alimentation activées!\n\n🍼 Après quelques alimentations enregistrées, je vous préviendrai peu avant la prochaine probable.",
+        "setup_nudges_disabled": "🔕 Alertes de prochaine alimentation désactivées.",
+        "setup_nudges_error": "😔 Désolé, il y a eu une erreur lors de la mise à jour de vos alertes. Veuillez réessayer.",
+        "nudge_next_feed": "🍼 Prochaine alimentation probablement vers {time} ⏰",
+        
+        # Quick-log keyboard
+        "feed_quick_prompt": "🍼 Combien le bébé a-t-il bu?\n\n👆 Touchez une quantité, ou utilisez /feed <ml> pour une autre",
+        
+        # Export command
+        "export_caption": "📦 Votre historique: {n_feeds} alimentations",
+        "export_empty": "📭 Il n'y a pas encore d'alimentations à exporter.\n💡 Utilisez /feed <ml> pour enregistrer votre premier biberon!",
+        "export_error": "😔 Désolé, il y a eu une erreur lors de l'export. Veuillez réessayer.",
     },
     
     "it": {
@@ -147,6 +240,37 @@ MESSAGES = {
         "setup_reminder_set": "✅ Promemoria giornaliero impostato alle: {time} 🕐\n\n📅 Riceverai il tuo riassunto giornaliero a quest'ora ogni giorno!",
         "setup_reminder_current": "🕐 Il tuo orario attuale del promemoria giornaliero è: {time}",
         "setup_reminder_error": "😔 Spiacente, c'è stato un errore nell'impostare il tuo orario di promemoria. Riprova.",
+        
+        # Baby command
+        "baby_usage": "👶 Uso:\n/baby - mostra il profilo condiviso del bambino\n/baby new <nome> - crea un profilo da condividere con altre persone\n/baby join <codice> - unisciti a un profilo con il suo codice di invito",
+        "baby_not_set": "👶 Stai registrando le alimentazioni solo per te.\n\n👨‍👩‍👧 Usa /baby new <nome> per creare un profilo condiviso, oppure /baby join <codice> per unirti a uno.",
+        "baby_current": "👶 Alimentazioni registrate per: {name}\n👨‍👩‍👧 Persone: {n_caregivers}\n🔑 Codice di invito: {invite_code}",
+        "baby_created": "✅ Profilo creato per {name} 👶\n\n🔑 Condividi questo codice di invito con le altre persone: {invite_code}\n📍 Possono unirsi con: /baby join {invite_code}",
+        "baby_joined": "✅ Ti sei unito al profilo di {name} 👶\n\n🍼 Le alimentazioni registrate da chiunque ora contano nello stesso riassunto giornaliero.",
+        "baby_invalid_code": "❌ Nessun profilo trovato con il codice di invito: {invite_code}",
+        "baby_error": "😔 Spiacente, c'è stato un errore nell'aggiornare il profilo. Riprova.",
+        "caregiver_feeds_header": "👨‍👩‍👧 Nuove alimentazioni dalle altre persone:",
+        "caregiver_feed_line": "🍼 {baby_name}: {amount_ml} ml ({caregiver})",
+        
+        # Rate limiting
+        "rate_limited": "🐢 Piano! Troppe richieste, riprova tra un minuto.",
+        "bot_busy": "⏳ Il bot è molto occupato in questo momento. Riprova tra poco.",
+        
+        # Feed nudges
+        "setup_nudges_button_on": "🔔 Avvisi prossima alimentazione: attivi",
+        "setup_nudges_button_off": "🔕 Avvisi prossima alimentazione: disattivi",
+        "setup_nudges_enabled": "🔔 Avvisi prossima alimentazione attivati!\n\n🍼 Dopo qualche alimentazione registrata, ti avviserò poco prima della prossima probabile.",
+        "setup_nudges_disabled": "🔕 Avvisi prossima alimentazione disattivati.",
+        "setup_nudges_error": "😔 Spiacente, c'è stato un errore nell'aggiornare i tuoi avvisi. Riprova.",
+        "nudge_next_feed": "🍼 Prossima alimentazione probabilmente verso le {time} ⏰",
+        
+        # Quick-log keyboard
+        "feed_quick_prompt": "🍼 Quanto ha bevuto il bambino?\n\n👆 Tocca una quantità, oppure usa /feed <ml> per un'altra",
+        
+        # Export command
+        "export_caption": "📦 La tua cronologia: {n_feeds} alimentazioni",
+        "export_empty": "📭 Non ci sono ancora alimentazioni da esportare.\n💡 Usa /feed <ml> per registrare il tuo primo biberon!",
+        "export_error": "😔 Spiacente, c'è stato un errore nell'esportare le tue alimentazioni. Riprova.",
     }
 }
 
@@ -0,0 +1,207 @@
+import asyncio
+import itertools
+import logging
+import time
+
+from telegram.error import BadRequest, NetworkError, RetryAfter
+
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes: lower values are sent first
+INTERACTIVE = 0
+BULK = 1
+
+
+class OutboundMessage:
+    """A Bot API call waiting to be sent, and the future its caller may await"""
+
+    def __init__(self, method: str, kwargs: dict, future: asyncio.Future):
+        self.method = method
+        self.kwargs = kwargs
+        self.future = future
+        self.attempts = 0
+
+    @property
+    def chat_id(self):
+        return self.kwargs.get("chat_id")
+
+
+class OutboundDispatcher:
+    """
+    Sends every outgoing Bot API call through one prioritized queue.
+
+    - A global token bucket keeps the bot under Telegram's ~30 msg/s limit and
+      a per-chat bucket under ~1 msg/s per chat.
+    - Interactive replies always go before bulk messages (daily summaries,
+      caregiver notifications); within a lane messages keep submission order.
+    - RetryAfter pauses all sending for the requested time and the message is
+      retried; network errors and timeouts are retried with backoff up to
+      `max_retries`, while bad requests fail at once since resending can't fix them.
+    - At most `retry_queue_size` messages wait for a retry at once; when that
+      is full, workers block instead of dropping messages.
+    """
+
+    def __init__(self, global_rate: float = 25, chat_rate: float = 1, chat_burst: float = 3,
+                 workers: int = 4, max_retries: int = 5, retry_queue_size: int = 1000):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.n_workers = workers
+        self.max_retries = max_retries
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: dict[int, TokenBucket] = {}
+        self._queue: asyncio.PriorityQueue | None = None
+        self._retry_slots: asyncio.Semaphore | None = None
+        self._retry_queue_size = retry_queue_size
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._delayed = 0
+        self._workers: list[asyncio.Task] = []
+        self._last_prune = time.monotonic()
+        self._bot = None
+        self._sent = 0
+        self._retry_after_count = 0
+        self._failed = 0
+
+    async def start(self, bot):
+        self._bot = bot
+        self._queue = asyncio.PriorityQueue()
+        self._retry_slots = asyncio.Semaphore(self._retry_queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.n_workers)]
+        logger.info(f"Outbound dispatcher started with {self.n_workers} workers")
+
+    async def stop(self, timeout: float = 10):
+        """Give queued messages a chance to go out, then stop the workers"""
+        deadline = time.monotonic() + timeout
+        while (self._queue.qsize() or self._delayed) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info(f"Outbound dispatcher stopped, {self._queue.qsize() + self._delayed} messages left unsent")
+
+    def submit(self, method: str, priority: int = BULK, **kwargs) -> asyncio.Future:
+        """Queue a Bot API call; the returned future resolves with its result"""
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(self._log_failure)
+        self._queue.put_nowait((priority, next(self._sequence), OutboundMessage(method, kwargs, future)))
+        return future
+
+    async def send_message(self, chat_id: int, text: str, priority: int = INTERACTIVE, **kwargs):
+        """Send a message and wait until it has been delivered (for jobs, not update handlers)"""
+        return await self.submit("send_message", priority, chat_id=chat_id, text=text, **kwargs)
+
+    async def _worker(self):
+        while True:
+            priority, sequence, message = await self._queue.get()
+            try:
+                await self._deliver(priority, sequence, message)
+            except Exception as e:
+                # Never let one message kill a worker
+                logger.error(f"Unexpected error delivering {message.method} to chat {message.chat_id}: {e}")
+                if not message.future.done():
+                    message.future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, priority: int, sequence: int, message: OutboundMessage):
+        if message.future.cancelled():
+            return
+
+        # Chats that are over their own limit wait aside so other chats keep flowing
+        chat_bucket = self._chat_bucket(message.chat_id)
+        if chat_bucket is not None:
+            wait = chat_bucket.time_until()
+            if wait > 0:
+                self._requeue_later(wait, (priority, sequence, message))
+                return
+
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+        while not self._global_bucket.try_acquire():
+            await asyncio.sleep(self._global_bucket.time_until())
+
+        if chat_bucket is not None and not chat_bucket.try_acquire():
+            # Another worker took the chat's token meanwhile
+            self._global_bucket.refund()
+            self._requeue_later(chat_bucket.time_until(), (priority, sequence, message))
+            return
+
+        try:
+            result = await getattr(self._bot, message.method)(**message.kwargs)
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, "total_seconds") else float(e.retry_after)
+            self._retry_after_count += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            logger.warning(f"Flood control: pausing outbound messages for {retry_after} s")
+            await self._retry(retry_after, (priority, sequence, message))
+        except BadRequest as e:
+            # A NetworkError subclass, but permanent (blocked chat, bad markup, ...)
+            self._failed += 1
+            message.future.set_exception(e)
+        except NetworkError as e:
+            message.attempts += 1
+            if message.attempts > self.max_retries:
+                self._failed += 1
+                message.future.set_exception(e)
+                return
+            backoff = min(2 ** message.attempts, 60)
+            logger.warning(f"Network error sending to chat {message.chat_id}, retrying in {backoff} s: {e}")
+            await self._retry(backoff, (priority, sequence, message))
+        except Exception as e:
+            self._failed += 1
+            message.future.set_exception(e)
+        else:
+            self._sent += 1
+            if not message.future.done():
+                message.future.set_result(result)
+
+    async def _retry(self, delay: float, entry: tuple):
+        # Blocks this worker while the retry queue is full, so nothing is dropped
+        await self._retry_slots.acquire()
+        self._requeue_later(delay, entry, retry_slot=True)
+
+    def _requeue_later(self, delay: float, entry: tuple, retry_slot: bool = False):
+        self._delayed += 1
+
+        def requeue():
+            self._delayed -= 1
+            if retry_slot:
+                self._retry_slots.release()
+            self._queue.put_nowait(entry)
+
+        asyncio.get_running_loop().call_later(delay, requeue)
+
+    def _chat_bucket(self, chat_id):
+        if chat_id is None:
+            return None
+        self._prune()
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        for chat_id in [cid for cid, bucket in self._chat_buckets.items() if bucket.is_full]:
+            del self._chat_buckets[chat_id]
+
+    @staticmethod
+    def _log_failure(future: asyncio.Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Outbound message failed: {future.exception()}")
+
+    def snapshot(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "delayed": self._delayed,
+            "sent": self._sent,
+            "failed": self._failed,
+            "retry_after": self._retry_after_count,
+        }
@@ -0,0 +1,119 @@
+import math
+import time
+from datetime import datetime, timedelta
+
+
+class FeedIntervalEstimator:
+    """
+    Exponentially weighted mean and variance of the time between feeds.
+
+    Each new feed updates the estimate in O(1); the feed history is never
+    re-read. Very short gaps (top-ups) and very long ones (missed logs) are
+    not counted as intervals.
+    """
+
+    def __init__(self, alpha: float = 0.3, min_interval: float = 15 * 60,
+                 max_interval: float = 8 * 3600):
+        self.alpha = alpha
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.last_feed_at: datetime | None = None
+        self.mean = 0.0
+        self.variance = 0.0
+        self.samples = 0
+
+    def update(self, fed_at: datetime):
+        if self.last_feed_at is None or fed_at > self.last_feed_at + timedelta(seconds=self.max_interval):
+            self.last_feed_at = fed_at
+            return
+
+        interval = (fed_at - self.last_feed_at).total_seconds()
+        if interval < self.min_interval:
+            # Backdated feed or a top-up of the previous one
+            return
+
+        self.last_feed_at = fed_at
+        if self.samples == 0:
+            self.mean = interval
+        else:
+            diff = interval - self.mean
+            increment = self.alpha * diff
+            self.mean += increment
+            self.variance = (1 - self.alpha) * (self.variance + diff * increment)
+        self.samples += 1
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def variation(self) -> float:
+        """Spread of the intervals relative to their mean (coefficient of variation)"""
+        return self.stddev / self.mean if self.mean else 0.0
+
+    def next_feed_at(self) -> datetime | None:
+        """Expected time of the next feed, or None until there's an interval to go by"""
+        if self.last_feed_at is None or self.samples == 0:
+            return None
+        return self.last_feed_at + timedelta(seconds=self.mean)
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel shared by every pending timer.
+
+    A single periodic tick advances the wheel one slot and only looks at the
+    timers in that slot, so the cost per tick doesn't depend on how many
+    timers are pending. Scheduling a key again replaces its previous timer.
+    """
+
+    def __init__(self, tick_seconds: float = 60, n_slots: int = 512):
+        self.tick_seconds = tick_seconds
+        self.n_slots = n_slots
+        self._slots: list[list] = [[] for _ in range(n_slots)]
+        self._timers: dict = {}
+        self._cursor = 0
+        self._current_tick = int(time.time() // tick_seconds)
+
+    def _tick_of(self, when: datetime) -> int:
+        return int(when.timestamp() // self.tick_seconds)
+
+    def schedule(self, key, when: datetime, payload):
+        tick = self._tick_of(when)
+
+        # Timers already due fire on the next tick
+        ticks_away = max(tick - self._current_tick, 1)
+        slot = (self._cursor + ticks_away) % self.n_slots
+        rounds = (ticks_away - 1) // self.n_slots
+
+        entry = [key, rounds, payload]
+        self._timers[key] = entry
+        self._slots[slot].append(entry)
+
+    def cancel(self, key):
+        self._timers.pop(key, None)
+
+    def advance(self, now: datetime) -> list:
+        """Move the wheel up to `now` and return the payloads of timers that fired"""
+        target = self._tick_of(now)
+        fired = []
+        while self._current_tick < target:
+            self._current_tick += 1
+            self._cursor = (self._cursor + 1) % self.n_slots
+            remaining = []
+            for entry in self._slots[self._cursor]:
+                key, rounds, payload = entry
+                if self._timers.get(key) is not entry:
+                    # Cancelled or rescheduled
+                    continue
+                if rounds > 0:
+                    entry[1] -= 1
+                    remaining.append(entry)
+                else:
+                    del self._timers[key]
+                    fired.append(payload)
+            self._slots[self._cursor] = remaining
+        return fired
+
+    def __len__(self):
+        return len(self._timers)
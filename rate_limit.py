@@ -0,0 +1,97 @@
+import time
+
+# Which bucket denied an update
+USER_LIMITED = "user"
+GLOBAL_LIMITED = "global"
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens if available, without waiting"""
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def refund(self, tokens: float = 1.0):
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
+    def time_until(self, tokens: float = 1.0) -> float:
+        """Seconds until `tokens` are available (0 if they already are)"""
+        self._refill(time.monotonic())
+        if self.tokens >= tokens:
+            return 0.0
+        return (tokens - self.tokens) / self.rate
+
+    @property
+    def is_full(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class RateLimiter:
+    """
+    Per-user and global token buckets for incoming updates.
+
+    An update is allowed only if both the user's bucket and the global bucket
+    have a token; `check` reports which one denied it. Users whose bucket has
+    refilled completely are forgotten, so memory only grows with the number
+    of currently active users.
+    """
+
+    def __init__(self, user_rate: float, user_burst: float,
+                 global_rate: float, global_burst: float,
+                 warn_interval: float = 30.0):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.warn_interval = warn_interval
+        self._user_buckets: dict[int, TokenBucket] = {}
+        self._warned_at: dict[tuple[int, str], float] = {}
+        self._last_prune = time.monotonic()
+
+    def check(self, user_id: int) -> str | None:
+        """None if the update is allowed, else USER_LIMITED or GLOBAL_LIMITED"""
+        self._prune()
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            bucket = self._user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+
+        if not bucket.try_acquire():
+            return USER_LIMITED
+        if not self.global_bucket.try_acquire():
+            # Don't charge the user for a global overload
+            bucket.refund()
+            return GLOBAL_LIMITED
+        return None
+
+    def should_warn(self, user_id: int, limited: str = USER_LIMITED) -> bool:
+        """True at most once per warn interval and kind of limit, so spammers aren't answered every time"""
+        now = time.monotonic()
+        if now - self._warned_at.get((user_id, limited), 0.0) < self.warn_interval:
+            return False
+        self._warned_at[(user_id, limited)] = now
+        return True
+
+    def _prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        for user_id in [uid for uid, bucket in self._user_buckets.items() if bucket.is_full]:
+            del self._user_buckets[user_id]
+        for key in [key for key, warned_at in self._warned_at.items() if now - warned_at >= self.warn_interval]:
+            del self._warned_at[key]
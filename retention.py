@@ -0,0 +1,120 @@
+import glob
+import gzip
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from schema import FEEDS_DATE_COLUMN
+
+logger = logging.getLogger(__name__)
+
+
+class FeedArchive:
+    """
+    Cold storage for raw feeds as gzip-compressed JSON Lines files.
+
+    Files are partitioned by the month the feed was logged in and by user:
+    `<archive_dir>/feeds/YYYY-MM/user-<user_id>-<run timestamp>.jsonl.gz`,
+    so reading one user's feeds only opens that user's files.
+    """
+
+    def __init__(self, archive_dir: str):
+        self.root = os.path.join(archive_dir, "feeds")
+
+    def write(self, rows: list[dict]) -> list[str]:
+        """Append rows to their month and user partitions, returns the files written"""
+        partitions = defaultdict(list)
+        for row in rows:
+            partitions[(str(row[FEEDS_DATE_COLUMN])[:7], row["user_id"])].append(row)
+
+        run_stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        paths = []
+        for (month, user_id), partition_rows in partitions.items():
+            partition = os.path.join(self.root, month)
+            os.makedirs(partition, exist_ok=True)
+            path = os.path.join(partition, f"user-{user_id}-{run_stamp}.jsonl.gz")
+            with gzip.open(path, "wt", encoding="utf-8") as archive_file:
+                for row in partition_rows:
+                    archive_file.write(json.dumps(row, default=str) + "\n")
+                archive_file.flush()
+                os.fsync(archive_file.fileno())
+            paths.append(path)
+        return paths
+
+    def read_user_feeds(self, user_id: int, month: str = "*") -> list[dict]:
+        """Archived feeds logged by a user (in one YYYY-MM month if given), oldest partitions first"""
+        feeds = []
+        for path in sorted(glob.glob(os.path.join(self.root, month, f"user-{user_id}-*.jsonl.gz"))):
+            with gzip.open(path, "rt", encoding="utf-8") as archive_file:
+                for line in archive_file:
+                    feeds.append(json.loads(line))
+        return feeds
+
+
+def build_daily_rollups(rows: list[dict]) -> dict[tuple[int, str], dict]:
+    """Aggregate raw feeds into one row per (user_id, day)"""
+    rollups = {}
+    for row in rows:
+        key = (row["user_id"], str(row[FEEDS_DATE_COLUMN])[:10])
+        rollup = rollups.get(key)
+        if rollup is None:
+            rollup = rollups[key] = {
+                "user_id": key[0],
+                "day": key[1],
+                "baby_id": row.get("baby_id"),
+                "n_feeds": 0,
+                "total_ml": 0,
+            }
+        rollup["n_feeds"] += 1
+        rollup["total_ml"] += row.get("amount_ml") or 0
+    return rollups
+
+
+def rebuild_daily_rollups(archive: FeedArchive, keys) -> dict[tuple[int, str], dict]:
+    """Recompute the (user_id, day) rollups in `keys` from every archived row for them"""
+    keys = set(keys)
+    archived = {}
+    for user_id, month in {(user_id, day[:7]) for user_id, day in keys}:
+        for row in archive.read_user_feeds(user_id, month):
+            # A retried batch is archived again, so the same feed can appear twice
+            archived[row["id"]] = row
+    rollups = build_daily_rollups(list(archived.values()))
+    return {key: rollup for key, rollup in rollups.items() if key in keys}
+
+
+def compact_old_feeds(supabase, archive: FeedArchive, retention_days: int,
+                      batch_size: int = 500, max_batches: int = 20) -> int:
+    """
+    Move feeds older than `retention_days` out of the hot table.
+
+    Each batch is written to the archive first, then the per-day rollups it
+    touches are rebuilt from the archive, and only then is it deleted from
+    `feeds`. A failure part-way never loses raw data, and a retried batch
+    doesn't count twice: rollups are recomputed from the archived rows,
+    deduplicated by feed id, never incremented. Returns the number of feeds
+    compacted.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    compacted = 0
+
+    for _ in range(max_batches):
+        rows = supabase.get_feeds_before(cutoff, batch_size)
+        if not rows:
+            break
+
+        archive.write(rows)
+
+        rollups = rebuild_daily_rollups(archive, build_daily_rollups(rows).keys())
+        if supabase.upsert_feed_rollups(list(rollups.values())) is None:
+            raise RuntimeError("Could not store feed rollups")
+
+        if supabase.delete_feeds([row["id"] for row in rows]) is None:
+            raise RuntimeError("Could not delete archived feeds")
+
+        compacted += len(rows)
+        if len(rows) < batch_size:
+            break
+
+    return compacted
@@ -0,0 +1,5 @@
+# Table layout shared by the Supabase client and modules that work on raw rows
+# (kept free of the Supabase SDK so those modules import without it)
+
+# Timestamp column feeds are filtered by day on
+FEEDS_DATE_COLUMN = "created_at"
@@ -1,41 +1,91 @@
 import os
-from datetime import date
+import asyncio
+from datetime import date, datetime, timedelta
 from supabase import create_client, Client
 from dotenv import load_dotenv
 
+from schema import FEEDS_DATE_COLUMN
+
 # Load environment variables
 load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 
+class AsyncSupabaseClient:
+    """
+    Awaitable view of a SupabaseClient for async handlers.
+    
+    The Supabase SDK client is synchronous; every call made through this
+    wrapper runs in a worker thread, so a slow request never blocks the
+    event loop (and with it every other user's updates).
+    """
+
+    def __init__(self, client: "SupabaseClient"):
+        self._client = client
+
+    def __getattr__(self, name):
+        method = getattr(self._client, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
 class SupabaseClient:
     def __init__(self):
         self.supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-    def register_feed(self, user_id: int, amount_ml: int):
-        """Register a new feeding in the database"""
+    def register_feed(self, user_id: int, amount_ml: int, baby_id: int | None = None,
+                      idempotency_key: str | None = None, fed_at: datetime | None = None):
+        """
+        Register a new feeding in the database, linked to a baby profile if given.
+        
+        With an idempotency key, a feed already stored under the same key is left
+        untouched and the response carries no rows. `fed_at` backdates the feed.
+        """
         data = {
             "user_id": user_id,
             "amount_ml": amount_ml,
         }
-        return self.supabase.table("feeds").insert(data).execute()
+        if baby_id is not None:
+            data["baby_id"] = baby_id
+        if fed_at is not None:
+            data[FEEDS_DATE_COLUMN] = fed_at.isoformat()
+        if idempotency_key is None:
+            return self.supabase.table("feeds").insert(data).execute()
+        
+        data["idempotency_key"] = idempotency_key
+        return (
+            self.supabase.table("feeds")
+            .upsert(data, on_conflict="idempotency_key", ignore_duplicates=True)
+            .execute()
+        )
 
-    def get_daily_feeds(self, user_id: int, day: date):
-        """Get all feedings for a specific user on a specific day"""
+    def get_daily_feeds(self, user_id: int, day: date, baby_id: int | None = None):
+        """Get all feedings for a specific user (or shared baby profile) on a specific day"""
+        # Shared profiles aggregate every caregiver's feeds for the baby
+        column, value = ("baby_id", baby_id) if baby_id is not None else ("user_id", user_id)
         try:
-            # First, let's get all feeds to see what columns exist
+            # Filter by day in the database: one round trip, no full-history scan
             response = (
                 self.supabase.table("feeds")
                 .select("*")
-                .eq("user_id", user_id)
-                .limit(1)
+                .eq(column, value)
+                .gte(FEEDS_DATE_COLUMN, day.isoformat())
+                .lt(FEEDS_DATE_COLUMN, (day + timedelta(days=1)).isoformat())
                 .execute()
             )
             
-            if response.data:
-                print(f"Available columns in feeds table: {list(response.data[0].keys())}")
+            return response.data if response.data else []
             
-            # Get all feeds for this user
+        except Exception as e:
+            print(f"Error getting daily feeds: {e}")
+            return []
+
+    def get_all_user_feeds(self, user_id: int):
+        """Get all feeds for a user (for debugging)"""
+        try:
             response = (
                 self.supabase.table("feeds")
                 .select("*")
@@ -43,71 +93,67 @@ class SupabaseClient:
                 .execute()
             )
             
-            all_feeds = response.data if response.data else []
-            print(f"Total feeds found for user {user_id}: {len(all_feeds)}")
-            
-            # If no timestamp column exists, return all feeds for now
-            if not all_feeds:
-                return []
-            
-            # Check what date/time columns are available
-            sample_feed = all_feeds[0]
-            date_columns = []
-            for key in sample_feed.keys():
-                if any(word in key.lower() for word in ['created', 'date', 'time', 'timestamp']):
-                    date_columns.append(key)
-            
-            print(f"Potential date columns found: {date_columns}")
-            
-            # If no date column found, return all feeds (needs manual filtering)
-            if not date_columns:
-                print("No date columns found, returning all feeds")
-                return all_feeds
-            
-            # Try to filter by the first date column found
-            date_column = date_columns[0]
-            day_str = day.isoformat()
-            
-            today_feeds = []
-            for feed in all_feeds:
-                date_value = feed.get(date_column, '')
-                if date_value:
-                    try:
-                        # Extract date part
-                        if 'T' in str(date_value):
-                            feed_date = str(date_value).split('T')[0]
-                        elif ' ' in str(date_value):
-                            feed_date = str(date_value).split(' ')[0]
-                        else:
-                            feed_date = str(date_value)
-                        
-                        if feed_date == day_str:
-                            today_feeds.append(feed)
-                    except Exception as e:
-                        continue
-            
-            print(f"Feeds found for {day_str}: {len(today_feeds)}")
-            return today_feeds
+            return response.data if response.data else []
+        except Exception as e:
+            print(f"Error getting all user feeds: {e}")
+            return []
+
+    def get_recent_feed_amounts(self, user_id: int, limit: int = 50):
+        """Get the amounts of a user's most recent feeds, newest first"""
+        try:
+            response = (
+                self.supabase.table("feeds")
+                .select("amount_ml")
+                .eq("user_id", user_id)
+                .order(FEEDS_DATE_COLUMN, desc=True)
+                .limit(limit)
+                .execute()
+            )
             
+            return [row["amount_ml"] for row in response.data] if response.data else []
         except Exception as e:
-            print(f"Error getting daily feeds: {e}")
+            print(f"Error getting recent feed amounts: {e}")
             return []
 
-    def get_all_user_feeds(self, user_id: int):
-        """Get all feeds for a user (for debugging)"""
+    def get_feeds_before(self, cutoff: datetime, limit: int):
+        """Get the oldest feeds logged before `cutoff`, up to `limit` rows"""
         try:
             response = (
                 self.supabase.table("feeds")
                 .select("*")
-                .eq("user_id", user_id)
+                .lt(FEEDS_DATE_COLUMN, cutoff.isoformat())
+                .order(FEEDS_DATE_COLUMN)
+                .limit(limit)
                 .execute()
             )
             
             return response.data if response.data else []
         except Exception as e:
-            print(f"Error getting all user feeds: {e}")
+            print(f"Error getting old feeds: {e}")
             return []
 
+    def delete_feeds(self, feed_ids: list[int]):
+        """Delete feeds by id (after they have been archived)"""
+        try:
+            return self.supabase.table("feeds").delete().in_("id", feed_ids).execute()
+        except Exception as e:
+            # Log the error but don't crash
+            print(f"Error deleting feeds: {e}")
+            return None
+
+    def upsert_feed_rollups(self, rollups: list[dict]):
+        """Insert or replace per-day rollups, one row per (user_id, day)"""
+        try:
+            return (
+                self.supabase.table("feed_daily_rollups")
+                .upsert(rollups, on_conflict="user_id,day")
+                .execute()
+            )
+        except Exception as e:
+            # Log the error but don't crash
+            print(f"Error storing feed rollups: {e}")
+            return None
+
     def set_user_timezone(self, user_id: int, timezone: str):
         """Set or update the timezone for a user"""
         try:
@@ -231,3 +277,154 @@ class SupabaseClient:
             # Log the error but don't crash
             print(f"Error getting user reminder time: {e}")
             return None
+
+    def set_user_nudges(self, user_id: int, enabled: bool):
+        """Enable or disable "feed due" nudges for a user"""
+        try:
+            data = {
+                "user_id": user_id,
+                "nudges_enabled": enabled,
+            }
+            return self.supabase.table("user_settings").upsert(data).execute()
+        except Exception as e:
+            # Log the error but don't crash
+            print(f"Error setting user nudges: {e}")
+            return None
+
+    def get_user_nudges(self, user_id: int):
+        """Whether a user wants "feed due" nudges (off unless enabled)"""
+        try:
+            response = (
+                self.supabase.table("user_settings")
+                .select("nudges_enabled")
+                .eq("user_id", user_id)
+                .execute()
+            )
+            
+            if response.data and len(response.data) > 0:
+                return bool(response.data[0].get("nudges_enabled"))
+            return False
+        except Exception as e:
+            # Log the error but don't crash
+            print(f"Error getting user nudges: {e}")
+            return False
+
+    def create_baby(self, user_id: int, name: str, invite_code: str):
+        """Create a shared baby profile and join its creator as the first caregiver"""
+        try:
+            data = {
+                "name": name,
+                "invite_code": invite_code,
+                "created_by": user_id,
+            }
+            response = self.supabase.table("babies").insert(data).execute()
+            if not response.data:
+                return None
+            
+            baby = response.data[0]
+            if self.add_caregiver(baby["id"], user_id) is None:
+                return None
+            return baby
+        except Exception as e:
+            # Log the error but don't crash
+            print(f"Error creating baby profile: {e}")
+            return None
+
+    def get_baby(self, baby_id: int):
+        """Get a baby profile by id, returns None if not found"""
+        try:
+            response = (
+                self.supabase.table("babies")
+                .select("*")
+                .eq("id", baby_id)
+                .execute()
+            )
+            
+            if response.data and len(response.data) > 0:
+                return response.data[0]
+            return None
+        except Exception as e:
+            # Log the error but don't crash
+            print(f"Error getting baby profile: {e}")
+            return None
+
+    def get_baby_by_invite_code(self, invite_code: str):
+        """Get a baby profile by its invite code, returns None if not found"""
+        try:
+            response = (
+                self.supabase.table("babies")
+                .select("*")
+                .eq("invite_code", invite_code)
+                .execute()
+            )
+            
+            if response.data and len(response.data) > 0:
+                return response.data[0]
+            return None
+        except Exception as e:
+            # Log the error but don't crash
+            print(f"Error getting baby by invite code: {e}")
+            return None
+
+    def add_caregiver(self, baby_id: int, user_id: int):
+        """
+        Join a user to a baby profile (a user logs for one baby at a time).
+        
+        Used both when creating and when joining a profile, so every caregiver's
+        individual feeds move into the shared log the same way.
+        """
+        try:
+            data = {
+                "baby_id": baby_id,
+                "user_id": user_id,
+            }
+            response = self.supabase.table("baby_caregivers").upsert(data, on_conflict="user_id").execute()
+            self._move_individual_feeds(user_id, baby_id)
+            return response
+        except Exception as e:
+            # Log the error but don't crash
+            print(f"Error adding caregiver: {e}")
+            return None
+
+    def _move_individual_feeds(self, user_id: int, baby_id: int):
+        """Link a user's feeds that aren't linked to any baby yet to `baby_id`"""
+        return (
+            self.supabase.table("feeds")
+            .update({"baby_id": baby_id})
+            .eq("user_id", user_id)
+            .is_("baby_id", "null")
+            .execute()
+        )
+
+    def get_user_baby_id(self, user_id: int):
+        """Get the baby profile a user logs for, returns None if logging individually"""
+        try:
+            response = (
+                self.supabase.table("baby_caregivers")
+                .select("baby_id")
+                .eq("user_id", user_id)
+                .execute()
+            )
+            
+            if response.data and len(response.data) > 0:
+                return response.data[0].get("baby_id")
+            return None
+        except Exception as e:
+            # Log the error but don't crash
+            print(f"Error getting user baby: {e}")
+            return None
+
+    def get_baby_caregivers(self, baby_id: int):
+        """Get the user ids of every caregiver of a baby profile"""
+        try:
+            response = (
+                self.supabase.table("baby_caregivers")
+                .select("user_id")
+                .eq("baby_id", baby_id)
+                .execute()
+            )
+            
+            return [row["user_id"] for row in response.data] if response.data else []
+        except Exception as e:
+            print(f"Error getting baby caregivers: {e}")
+            return []
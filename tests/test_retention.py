@@ -0,0 +1,71 @@
+import pytest
+
+from retention import FeedArchive, compact_old_feeds
+
+
+class FakeSupabase:
+    """Just the calls compact_old_feeds makes, over in-memory tables"""
+
+    def __init__(self, feeds, fail_deletes=0):
+        self.feeds = list(feeds)
+        self.rollups = {}
+        self.fail_deletes = fail_deletes
+
+    def get_feeds_before(self, cutoff, limit):
+        return [dict(row) for row in self.feeds[:limit]]
+
+    def upsert_feed_rollups(self, rollups):
+        for rollup in rollups:
+            self.rollups[(rollup["user_id"], rollup["day"])] = dict(rollup)
+        return rollups
+
+    def delete_feeds(self, feed_ids):
+        if self.fail_deletes:
+            self.fail_deletes -= 1
+            return None
+        self.feeds = [row for row in self.feeds if row["id"] not in feed_ids]
+        return feed_ids
+
+
+def make_feeds():
+    return [
+        {"id": i, "user_id": 1, "baby_id": None, "amount_ml": 100,
+         "created_at": f"2020-01-01T0{i}:00:00+00:00"}
+        for i in range(3)
+    ]
+
+
+def test_compaction_moves_feeds_to_archive_and_rollups(tmp_path):
+    supabase = FakeSupabase(make_feeds())
+    archive = FeedArchive(str(tmp_path))
+
+    assert compact_old_feeds(supabase, archive, retention_days=90) == 3
+    assert supabase.feeds == []
+    assert supabase.rollups[(1, "2020-01-01")]["n_feeds"] == 3
+    assert supabase.rollups[(1, "2020-01-01")]["total_ml"] == 300
+    assert len(archive.read_user_feeds(1)) == 3
+    assert archive.read_user_feeds(2) == []
+
+
+def test_retry_after_failed_delete_does_not_double_count(tmp_path):
+    supabase = FakeSupabase(make_feeds(), fail_deletes=1)
+    archive = FeedArchive(str(tmp_path))
+
+    # Rollups are stored, but the feeds stay in the hot table
+    with pytest.raises(RuntimeError):
+        compact_old_feeds(supabase, archive, retention_days=90)
+    assert len(supabase.feeds) == 3
+
+    assert compact_old_feeds(supabase, archive, retention_days=90) == 3
+    assert supabase.feeds == []
+    assert supabase.rollups[(1, "2020-01-01")]["n_feeds"] == 3
+    assert supabase.rollups[(1, "2020-01-01")]["total_ml"] == 300
+
+
+def test_rollups_span_batches(tmp_path):
+    supabase = FakeSupabase(make_feeds())
+    archive = FeedArchive(str(tmp_path))
+
+    assert compact_old_feeds(supabase, archive, retention_days=90, batch_size=2) == 3
+    assert supabase.rollups[(1, "2020-01-01")]["n_feeds"] == 3
+    assert supabase.rollups[(1, "2020-01-01")]["total_ml"] == 300
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Processes updates from different users concurrently while keeping each
+    user's own updates strictly in arrival order.
+
+    Every update first waits on its user's lock (asyncio locks wake waiters
+    in FIFO order) and only then takes one of the global concurrency slots,
+    so a user with a backlog never holds slots that other users could use.
+
+    With `shed_queue_depth` set, admission happens before an update is
+    queued: once that many updates are pending, new updates from users who
+    already have a backlog are shed (handed to `on_shed` instead of being
+    processed); at twice the depth every new update is shed. Users without
+    a backlog are admitted first, so their latency stays flat.
+    """
+
+    def __init__(self, max_concurrent_updates: int, shed_queue_depth: int | None = None,
+                 on_shed=None):
+        super().__init__(max_concurrent_updates)
+        self.shed_queue_depth = shed_queue_depth
+        self.on_shed = on_shed
+        self._shed = 0
+        self._user_locks: dict[int, asyncio.Lock] = {}
+        self._user_pending: dict[int, int] = {}
+        self._running = 0
+        self._max_queue_depth = 0
+        self._processed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @staticmethod
+    def _ordering_key(update: object):
+        """User (or chat) whose updates must stay in order, None if unordered"""
+        if isinstance(update, Update):
+            if update.effective_user:
+                return update.effective_user.id
+            if update.effective_chat:
+                return update.effective_chat.id
+        return None
+
+    async def process_update(self, update: object, coroutine) -> None:
+        key = self._ordering_key(update)
+        if key is None:
+            await super().process_update(update, coroutine)
+            return
+
+        if self._should_shed(key):
+            self._shed += 1
+            coroutine.close()
+            logger.warning(f"Shedding update from {key}: {self.queue_depth} updates pending")
+            if self.on_shed:
+                await self.on_shed(update)
+            return
+
+        queued_at = time.monotonic()
+        lock = self._user_locks.setdefault(key, asyncio.Lock())
+        self._user_pending[key] = self._user_pending.get(key, 0) + 1
+        self._max_queue_depth = max(self._max_queue_depth, self.queue_depth)
+        try:
+            async with lock:
+                await super().process_update(update, self._timed(coroutine, queued_at))
+        finally:
+            self._user_pending[key] -= 1
+            if not self._user_pending[key]:
+                # Nobody else is queued for this user, drop the lock
+                del self._user_pending[key]
+                del self._user_locks[key]
+
+    def _should_shed(self, key) -> bool:
+        if self.shed_queue_depth is None:
+            return False
+        depth = self.queue_depth
+        if depth < self.shed_queue_depth:
+            return False
+        return key in self._user_pending or depth >= 2 * self.shed_queue_depth
+
+    async def _timed(self, coroutine, queued_at: float):
+        wait = time.monotonic() - queued_at
+        self._processed += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        self._running += 1
+        try:
+            await coroutine
+        finally:
+            self._running -= 1
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    @property
+    def queue_depth(self) -> int:
+        """Updates received but not finished yet, including running ones"""
+        return sum(self._user_pending.values())
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """Queue and wait-time metrics; `reset` starts a new window for the max values"""
+        average_wait = self._total_wait / self._processed if self._processed else 0.0
+        stats = {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self._max_queue_depth,
+            "running": self._running,
+            "queued_users": len(self._user_pending),
+            "processed": self._processed,
+            "shed": self._shed,
+            "average_wait_ms": round(average_wait * 1000, 1),
+            "max_wait_ms": round(self._max_wait * 1000, 1),
+        }
+        if reset:
+            self._max_queue_depth = self.queue_depth
+            self._max_wait = 0.0
+        return stats